@@ -9,8 +9,12 @@ from tkinter import ttk, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import threading
-from queue_simulation import QueueSimulation
+from concurrent.futures import ThreadPoolExecutor
+from queue_simulation import QueueSimulation, decimate
+
+
+# シミュレーション時間を何区間に分けて実行するか
+PROGRESS_STEPS = 50
 
 
 class QueueSimulationGUI:
@@ -23,6 +27,11 @@ class QueueSimulationGUI:
         
         self.sim = None
         self.is_running = False
+        self._util_after_id = None
+        
+        # シミュレーションの各区間を実行する常駐ワーカー
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # デフォルトパラメータ
         self.num_servers = tk.IntVar(value=1)
@@ -95,9 +104,9 @@ class QueueSimulationGUI:
         self.update_utilization_display()
         
         # パラメータ変更時の利用率更新
-        self.num_servers.trace('w', lambda *args: self.update_utilization_display())
-        self.arrival_rate.trace('w', lambda *args: self.update_utilization_display())
-        self.service_rate.trace('w', lambda *args: self.update_utilization_display())
+        self.num_servers.trace('w', lambda *args: self.schedule_utilization_update())
+        self.arrival_rate.trace('w', lambda *args: self.schedule_utilization_update())
+        self.service_rate.trace('w', lambda *args: self.schedule_utilization_update())
         
         # ボタンフレーム
         button_frame = ttk.Frame(main_frame)
@@ -109,11 +118,20 @@ class QueueSimulationGUI:
             command=self.run_simulation
         ).grid(row=0, column=0, padx=5, pady=5)
         
+        ttk.Button(
+            button_frame, 
+            text="停止", 
+            command=self.stop_simulation
+        ).grid(row=0, column=1, padx=5, pady=5)
+        
         ttk.Button(
             button_frame, 
             text="リセット", 
             command=self.reset_simulation
-        ).grid(row=0, column=1, padx=5, pady=5)
+        ).grid(row=0, column=2, padx=5, pady=5)
+        
+        self.progress = ttk.Progressbar(button_frame, maximum=100)
+        self.progress.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), padx=5, pady=5)
         
         # 統計表示フレーム
         stats_frame = ttk.LabelFrame(main_frame, text="統計結果", padding="10")
@@ -143,7 +161,8 @@ class QueueSimulationGUI:
             )
             value_label = ttk.Label(stats_frame, text="--", font=("Arial", 9))
             value_label.grid(row=i, column=1, sticky=tk.W, padx=5, pady=2)
-            self.stats_labels[key] = (value_label, format_str)
+            is_float = "{:" in format_str
+            self.stats_labels[key] = (value_label, format_str, is_float)
         
         # グラフフレーム
         graph_frame = ttk.Frame(main_frame)
@@ -160,17 +179,47 @@ class QueueSimulationGUI:
         self.canvas = FigureCanvasTkAgg(self.fig, graph_frame)
         self.canvas.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # グラフの線やラベルは一度だけ作成し、結果ごとにデータのみ更新
+        self.line_q, = self.ax1.plot([], [], label='待ち行列の長さ', linewidth=1.5)
+        self.ax1.set_xlabel('時間')
+        self.ax1.set_ylabel('待ち行列の長さ')
+        self.ax1.set_title('時間経過に伴う待ち行列の長さ')
+        self.ax1.grid(True, alpha=0.3)
+        self.ax1.legend()
+        
+        self.line_n, = self.ax2.plot([], [], label='システム内の顧客数', color='orange', linewidth=1.5)
+        self.server_line = self.ax2.axhline(
+            y=self.num_servers.get(), 
+            color='r', 
+            linestyle='--',
+            label=f'サーバー数 ({self.num_servers.get()})', 
+            alpha=0.7
+        )
+        self.ax2.set_xlabel('時間')
+        self.ax2.set_ylabel('システム内の顧客数')
+        self.ax2.set_title('時間経過に伴うシステム内の顧客数')
+        self.ax2.grid(True, alpha=0.3)
+        self.ax2.legend()
+        
         # 初期グラフ
-        self.ax1.text(0.5, 0.5, 'シミュレーションを実行して結果を表示', 
-                     ha='center', va='center', transform=self.ax1.transAxes,
-                     fontsize=12, color='gray')
-        self.ax2.text(0.5, 0.5, 'シミュレーションを実行して結果を表示', 
-                     ha='center', va='center', transform=self.ax2.transAxes,
-                     fontsize=12, color='gray')
+        self.placeholders = [
+            ax.text(0.5, 0.5, 'シミュレーションを実行して結果を表示', 
+                    ha='center', va='center', transform=ax.transAxes,
+                    fontsize=12, color='gray')
+            for ax in (self.ax1, self.ax2)
+        ]
+        self.fig.tight_layout()
         self.canvas.draw()
         
+    def schedule_utilization_update(self):
+        """入力が落ち着いてから利用率の表示を更新"""
+        if self._util_after_id is not None:
+            self.root.after_cancel(self._util_after_id)
+        self._util_after_id = self.root.after(150, self.update_utilization_display)
+    
     def update_utilization_display(self):
         """利用率の表示を更新"""
+        self._util_after_id = None
         try:
             arrival = self.arrival_rate.get()
             service = self.service_rate.get()
@@ -178,89 +227,126 @@ class QueueSimulationGUI:
             
             if service > 0 and servers > 0:
                 rho = arrival / (servers * service)
-                color = "red" if rho >= 1.0 else "black"
-                self.utilization_label.config(
-                    text=f"利用率 (ρ): {rho:.4f}",
-                    foreground=color
-                )
                 if rho >= 1.0:
-                    self.utilization_label.config(
-                        text=f"利用率 (ρ): {rho:.4f} ⚠️ システムが不安定です",
-                        foreground=color
-                    )
+                    text = f"利用率 (ρ): {rho:.4f} ⚠️ システムが不安定です"
+                    color = "red"
+                else:
+                    text = f"利用率 (ρ): {rho:.4f}"
+                    color = "black"
+                self.utilization_label.config(text=text, foreground=color)
             else:
                 self.utilization_label.config(text="利用率 (ρ): --")
         except:
             self.utilization_label.config(text="利用率 (ρ): --")
     
     def validate_parameters(self):
-        """パラメータの検証"""
+        """
+        パラメータの検証
+
+        Returns:
+            有効な場合は (サーバー数, 到着率, サービス率, シミュレーション時間)、
+            無効な場合は None
+        """
         try:
-            if self.num_servers.get() < 1:
+            servers = self.num_servers.get()
+            arrival = self.arrival_rate.get()
+            service = self.service_rate.get()
+            max_time = self.max_time.get()
+            
+            if servers < 1:
                 messagebox.showerror("エラー", "サーバー数は1以上である必要があります")
-                return False
+                return None
             
-            if self.arrival_rate.get() <= 0:
+            if arrival <= 0:
                 messagebox.showerror("エラー", "到着率は正の数である必要があります")
-                return False
+                return None
             
-            if self.service_rate.get() <= 0:
+            if service <= 0:
                 messagebox.showerror("エラー", "サービス率は正の数である必要があります")
-                return False
+                return None
             
-            if self.max_time.get() <= 0:
+            if max_time <= 0:
                 messagebox.showerror("エラー", "シミュレーション時間は正の数である必要があります")
-                return False
+                return None
             
-            rho = self.arrival_rate.get() / (self.num_servers.get() * self.service_rate.get())
+            rho = arrival / (servers * service)
             if rho >= 1.0:
                 result = messagebox.askyesno(
                     "警告", 
                     "利用率が1以上です。システムが不安定になる可能性があります。\n続行しますか？"
                 )
                 if not result:
-                    return False
+                    return None
             
-            return True
+            return servers, arrival, service, max_time
         except Exception as e:
             messagebox.showerror("エラー", f"無効なパラメータ: {str(e)}")
-            return False
+            return None
     
     def run_simulation(self):
         """シミュレーションを実行"""
-        if not self.validate_parameters():
+        params = self.validate_parameters()
+        if params is None:
             return
+        servers, arrival, service, max_time = params
         
         if self.is_running:
             messagebox.showwarning("警告", "シミュレーションは既に実行中です")
             return
         
-        # 別スレッドでシミュレーションを実行
-        self.is_running = True
-        thread = threading.Thread(target=self._run_simulation_thread)
-        thread.daemon = True
-        thread.start()
-    
-    def _run_simulation_thread(self):
-        """シミュレーション実行スレッド"""
+        # 区間ごとにワーカースレッドで実行し、GUIの更新はメインスレッドで行う
         try:
-            # シミュレーションの作成と実行
             self.sim = QueueSimulation(
-                num_servers=self.num_servers.get(),
-                arrival_rate=self.arrival_rate.get(),
-                service_rate=self.service_rate.get()
+                num_servers=servers,
+                arrival_rate=arrival,
+                service_rate=service
             )
-            
-            max_customers = self.max_customers.get() if self.max_customers.get() > 0 else None
-            self.sim.run(max_time=self.max_time.get(), max_customers=max_customers)
-            
-            # GUIを更新（メインスレッドで実行する必要がある）
-            self.root.after(0, self.update_results)
-            
+            max_customers = self.max_customers.get()
+            self._max_time = max_time
+            self._max_customers = max_customers if max_customers > 0 else None
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("エラー", f"シミュレーションエラー: {str(e)}"))
-        finally:
+            messagebox.showerror("エラー", f"シミュレーションエラー: {str(e)}")
+            return
+        
+        self.is_running = True
+        self.progress['value'] = 0
+        self._step_chunk()
+    
+    def _step_chunk(self):
+        """シミュレーションの次の区間をワーカーに投入"""
+        sim = self.sim
+        duration = min(self._max_time / PROGRESS_STEPS, self._max_time - sim.horizon)
+        future = self._executor.submit(sim.run_chunk, duration, self._max_customers,
+                                       record_history=True)
+        future.add_done_callback(
+            lambda f: self.root.after(0, self._on_chunk_done, sim, f)
+        )
+    
+    def _on_chunk_done(self, sim, future):
+        """区間の実行完了時の処理（メインスレッド）"""
+        if not self.is_running or sim is not self.sim:
+            return
+        
+        error = future.exception()
+        if error is not None:
+            self.is_running = False
+            messagebox.showerror("エラー", f"シミュレーションエラー: {str(error)}")
+            return
+        
+        self.progress['value'] = 100 * sim.horizon / self._max_time
+        done = sim.horizon >= self._max_time or (
+            self._max_customers is not None and sim.customers_served >= self._max_customers
+        )
+        if done:
             self.is_running = False
+            self.progress['value'] = 100
+            self.update_results()
+        else:
+            self._step_chunk()
+    
+    def stop_simulation(self):
+        """実行中のシミュレーションを中止"""
+        self.is_running = False
     
     def update_results(self):
         """結果を表示"""
@@ -269,77 +355,60 @@ class QueueSimulationGUI:
         
         # 統計を更新
         stats = self.sim.get_statistics()
-        for key, (label, format_str) in self.stats_labels.items():
+        for key, (label, format_str, is_float) in self.stats_labels.items():
             if key in stats:
                 value = stats[key]
-                if isinstance(value, float):
-                    label.config(text=format_str.format(value))
-                else:
-                    label.config(text=str(value))
+                label.config(text=format_str.format(value) if is_float else str(value))
         
         # グラフを更新
-        self.ax1.clear()
-        self.ax2.clear()
-        
-        if self.sim.time_history:
+        n = self.sim.n_samples
+        if n:
+            # 描画幅のピクセル数程度まで間引く
+            n_out = int(self.fig.get_figwidth() * self.fig.dpi)
+            times = self.sim.time_history[:n]
+            
             # 待ち行列の長さ
-            self.ax1.plot(
-                self.sim.time_history, 
-                self.sim.queue_length_history,
-                label='待ち行列の長さ', 
-                linewidth=1.5
-            )
-            self.ax1.set_xlabel('時間')
-            self.ax1.set_ylabel('待ち行列の長さ')
-            self.ax1.set_title('時間経過に伴う待ち行列の長さ')
-            self.ax1.grid(True, alpha=0.3)
-            self.ax1.legend()
+            self.line_q.set_data(*decimate(times, self.sim.queue_length_history[:n], n_out))
             
             # システム内の顧客数
-            self.ax2.plot(
-                self.sim.time_history, 
-                self.sim.customers_in_system_history,
-                label='システム内の顧客数', 
-                color='orange', 
-                linewidth=1.5
-            )
-            self.ax2.axhline(
-                y=self.num_servers.get(), 
-                color='r', 
-                linestyle='--',
-                label=f'サーバー数 ({self.num_servers.get()})', 
-                alpha=0.7
-            )
-            self.ax2.set_xlabel('時間')
-            self.ax2.set_ylabel('システム内の顧客数')
-            self.ax2.set_title('時間経過に伴うシステム内の顧客数')
-            self.ax2.grid(True, alpha=0.3)
+            self.line_n.set_data(*decimate(times, self.sim.customers_in_system_history[:n], n_out))
+            servers = self.sim.num_servers
+            self.server_line.set_ydata([servers, servers])
+            self.server_line.set_label(f'サーバー数 ({servers})')
             self.ax2.legend()
+            
+            for text in self.placeholders:
+                text.set_visible(False)
+            for ax in (self.ax1, self.ax2):
+                ax.relim()
+                ax.autoscale_view()
         
-        self.fig.tight_layout()
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
         messagebox.showinfo("完了", "シミュレーションが完了しました")
     
+    def on_close(self):
+        """ウィンドウを閉じる"""
+        self.is_running = False
+        self._executor.shutdown(wait=False)
+        self.root.destroy()
+    
     def reset_simulation(self):
         """シミュレーションをリセット"""
         self.sim = None
         self.is_running = False
+        self.progress['value'] = 0
         
         # 統計をリセット
-        for key, (label, format_str) in self.stats_labels.items():
+        for label, _, _ in self.stats_labels.values():
             label.config(text="--")
         
         # グラフをリセット
-        self.ax1.clear()
-        self.ax2.clear()
-        self.ax1.text(0.5, 0.5, 'シミュレーションを実行して結果を表示', 
-                     ha='center', va='center', transform=self.ax1.transAxes,
-                     fontsize=12, color='gray')
-        self.ax2.text(0.5, 0.5, 'シミュレーションを実行して結果を表示', 
-                     ha='center', va='center', transform=self.ax2.transAxes,
-                     fontsize=12, color='gray')
-        self.canvas.draw()
+        self.line_q.set_data([], [])
+        self.line_n.set_data([], [])
+        for text in self.placeholders:
+            text.set_visible(True)
+        self.canvas.draw_idle()
 
 
 def main():
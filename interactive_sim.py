@@ -6,9 +6,12 @@ Provides an interactive interface for running queue simulations
 
 import sys
 import os
-from queue_simulation import QueueSimulation
+import argparse
+from queue_simulation import QueueSimulation, decimate
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import time
 
 
@@ -23,9 +26,14 @@ class InteractiveQueueSimulator:
         self.max_time = 100.0
         self.max_customers = None
 
+        if os.name == 'nt':
+            # Enable ANSI escape sequences in the Windows console
+            os.system('')
+
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('clear' if os.name == 'posix' else 'cls')
+        sys.stdout.write("\x1b[2J\x1b[H")
+        sys.stdout.flush()
 
     def print_header(self):
         """Print application header"""
@@ -122,7 +130,8 @@ class InteractiveQueueSimulator:
         )
 
         start_time = time.time()
-        self.sim.run(max_time=self.max_time, max_customers=self.max_customers)
+        self.sim.run(max_time=self.max_time, max_customers=self.max_customers,
+                     record_history=True)
         elapsed_time = time.time() - start_time
 
         print(f"✓ シミュレーション完了 (実行時間: {elapsed_time:.2f}秒)")
@@ -157,8 +166,14 @@ class InteractiveQueueSimulator:
 
         input("\nEnterキーを押して続行...")
 
-    def plot_results(self):
-        """Plot simulation results"""
+    def plot_results(self, path=None):
+        """
+        Plot simulation results
+
+        Args:
+            path: Write the plot to this PNG file with the Agg canvas
+                instead of opening a window (None to show it)
+        """
         if not self.sim:
             self.clear_screen()
             self.print_header()
@@ -166,10 +181,21 @@ class InteractiveQueueSimulator:
             input("\nEnterキーを押して続行...")
             return
 
-        fig, axes = plt.subplots(2, 1, figsize=(12, 8))
+        if path:
+            # Bypass pyplot and the GUI event loop entirely
+            fig = Figure(figsize=(12, 8), dpi=100)
+            canvas = FigureCanvasAgg(fig)
+            axes = fig.subplots(2, 1)
+        else:
+            fig, axes = plt.subplots(2, 1, figsize=(12, 8))
+        n = self.sim.n_samples
+        times = self.sim.time_history[:n]
+
+        # Keep about two points per horizontal pixel
+        n_out = int(fig.get_figwidth() * fig.dpi)
 
         # Plot queue length over time
-        axes[0].plot(self.sim.time_history, self.sim.queue_length_history,
+        axes[0].plot(*decimate(times, self.sim.queue_length_history[:n], n_out),
                      label='待ち行列の長さ', linewidth=1.5)
         axes[0].set_xlabel('時間')
         axes[0].set_ylabel('待ち行列の長さ')
@@ -178,7 +204,7 @@ class InteractiveQueueSimulator:
         axes[0].legend()
 
         # Plot customers in system over time
-        axes[1].plot(self.sim.time_history, self.sim.customers_in_system_history,
+        axes[1].plot(*decimate(times, self.sim.customers_in_system_history[:n], n_out),
                      label='システム内の顧客数', color='orange', linewidth=1.5)
         axes[1].axhline(y=self.num_servers, color='r', linestyle='--',
                        label=f'サーバー数 ({self.num_servers})', alpha=0.7)
@@ -188,8 +214,11 @@ class InteractiveQueueSimulator:
         axes[1].grid(True, alpha=0.3)
         axes[1].legend()
 
-        plt.tight_layout()
-        plt.show()
+        fig.tight_layout()
+        if path:
+            canvas.print_png(path)
+        else:
+            plt.show()
 
     def compare_theoretical(self):
         """Compare simulation results with theoretical values"""
@@ -212,32 +241,36 @@ class InteractiveQueueSimulator:
             input("\nEnterキーを押して続行...")
             return
 
-        print(f"{'指標':<30} {'シミュレーション':<20} {'理論値':<20} {'誤差':<15}")
-        print("-" * 85)
+        lines = [
+            f"{'指標':<30} {'シミュレーション':<20} {'理論値':<20} {'誤差':<15}",
+            "-" * 85,
+        ]
 
         # Utilization
         sim_util = sim_stats['server_utilization']
         theo_util = theo_stats['utilization']
         error_util = abs(sim_util - theo_util) / theo_util * 100 if theo_util != 0 else 0
-        print(f"{'利用率 (ρ)':<30} {sim_util:<20.4f} {theo_util:<20.4f} {error_util:<15.2f}%")
+        lines.append(f"{'利用率 (ρ)':<30} {sim_util:<20.4f} {theo_util:<20.4f} {error_util:<15.2f}%")
 
         # Average time in queue
         sim_wq = sim_stats['avg_waiting_time']
         theo_wq = theo_stats['avg_time_in_queue']
         error_wq = abs(sim_wq - theo_wq) / theo_wq * 100 if theo_wq != 0 else 0
-        print(f"{'平均待ち時間 (Wq)':<30} {sim_wq:<20.4f} {theo_wq:<20.4f} {error_wq:<15.2f}%")
+        lines.append(f"{'平均待ち時間 (Wq)':<30} {sim_wq:<20.4f} {theo_wq:<20.4f} {error_wq:<15.2f}%")
 
         # Average time in system
         sim_w = sim_stats['avg_system_time']
         theo_w = theo_stats['avg_time_in_system']
         error_w = abs(sim_w - theo_w) / theo_w * 100 if theo_w != 0 else 0
-        print(f"{'平均システム滞在時間 (W)':<30} {sim_w:<20.4f} {theo_w:<20.4f} {error_w:<15.2f}%")
+        lines.append(f"{'平均システム滞在時間 (W)':<30} {sim_w:<20.4f} {theo_w:<20.4f} {error_w:<15.2f}%")
 
         # Average queue length
         sim_lq = sim_stats['avg_queue_length']
         theo_lq = theo_stats['avg_customers_in_queue']
         error_lq = abs(sim_lq - theo_lq) / theo_lq * 100 if theo_lq != 0 else 0
-        print(f"{'平均待ち行列長 (Lq)':<30} {sim_lq:<20.4f} {theo_lq:<20.4f} {error_lq:<15.2f}%")
+        lines.append(f"{'平均待ち行列長 (Lq)':<30} {sim_lq:<20.4f} {theo_lq:<20.4f} {error_lq:<15.2f}%")
+
+        print("\n".join(lines))
 
         input("\nEnterキーを押して続行...")
 
@@ -260,69 +293,66 @@ class InteractiveQueueSimulator:
         # Run simulation step by step with visualization
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
 
-        # Schedule first arrival
-        first_arrival_time = self.sim.generate_interarrival_time()
-        from queue_simulation import Customer
-        first_customer = Customer(id=self.sim.next_customer_id, arrival_time=first_arrival_time)
-        self.sim.next_customer_id += 1
-        self.sim.schedule_event(first_arrival_time, 'arrival', first_customer)
-
-        times = []
-        queue_lengths = []
-        customers_in_system = []
-
-        def update(frame):
-            # Process events for a small time window
-            target_time = frame * (self.max_time / 200)  # 200 frames total
-
-            while self.sim.event_queue and self.sim.event_queue[0][0] <= target_time:
-                event_time, event_type, data = self.sim.event_queue[0]
-
-                if event_time > self.max_time:
-                    break
+        # Static decorations are drawn once; only the lines are blitted
+        line1, = ax1.plot([], [], 'b-', linewidth=1.5)
+        ax1.set_xlabel('時間')
+        ax1.set_ylabel('待ち行列の長さ')
+        ax1.set_title('リアルタイム待ち行列シミュレーション')
+        ax1.grid(True, alpha=0.3)
+        time_text = ax1.text(0.01, 0.95, '', transform=ax1.transAxes, va='top')
+
+        line2, = ax2.plot([], [], color='orange', linewidth=1.5)
+        ax2.axhline(y=self.num_servers, color='r', linestyle='--', alpha=0.7)
+        ax2.set_xlabel('時間')
+        ax2.set_ylabel('システム内の顧客数')
+        ax2.set_title('システム内の顧客数')
+        ax2.grid(True, alpha=0.3)
+        served_text = ax2.text(0.01, 0.95, '', transform=ax2.transAxes, va='top')
+
+        for ax in (ax1, ax2):
+            ax.set_xlim(0, self.max_time)
+        ax1.set_ylim(0, 5)
+        ax2.set_ylim(0, self.num_servers + 5)
+        plt.tight_layout()
 
-                # Pop event
-                import heapq
-                heapq.heappop(self.sim.event_queue)
+        sim = self.sim
+        k = 0
 
-                # Update statistics
-                time_delta = event_time - self.sim.last_event_time
-                self.sim.update_statistics(time_delta)
-                self.sim.current_time = event_time
-                self.sim.last_event_time = event_time
+        def init():
+            return line1, line2, time_text, served_text
 
-                # Handle event
-                if event_type == 'arrival':
-                    self.sim.handle_arrival(data)
-                elif event_type == 'departure':
-                    self.sim.handle_departure(data)
+        def update(frame):
+            nonlocal k
+            start = k
 
-                # Record data
-                times.append(self.sim.current_time)
-                queue_lengths.append(len(self.sim.waiting_queue))
-                customers_in_system.append(len(self.sim.waiting_queue) + self.sim.busy_servers)
+            # Process events for a small time window in compiled code
+            target_time = frame * (self.max_time / 200)  # 200 frames total
+            sim.run_until(min(target_time, self.max_time), record_history=True)
+            k = sim.n_samples
 
             # Update plots
-            ax1.clear()
-            ax2.clear()
-
-            if times:
-                ax1.plot(times, queue_lengths, 'b-', linewidth=1.5)
-                ax1.set_xlabel('時間')
-                ax1.set_ylabel('待ち行列の長さ')
-                ax1.set_title(f'リアルタイム待ち行列シミュレーション (時刻: {self.sim.current_time:.2f})')
-                ax1.grid(True, alpha=0.3)
-
-                ax2.plot(times, customers_in_system, 'orange', linewidth=1.5)
-                ax2.axhline(y=self.num_servers, color='r', linestyle='--', alpha=0.7)
-                ax2.set_xlabel('時間')
-                ax2.set_ylabel('システム内の顧客数')
-                ax2.set_title(f'顧客数: {self.sim.customers_served} サービス済')
-                ax2.grid(True, alpha=0.3)
-
-            plt.tight_layout()
-
-        anim = FuncAnimation(fig, update, frames=200, interval=50, repeat=False)
+            line1.set_data(sim.time_history[:k], sim.queue_length_history[:k])
+            line2.set_data(sim.time_history[:k], sim.customers_in_system_history[:k])
+            time_text.set_text(f'時刻: {sim.current_time:.2f}')
+            served_text.set_text(f'顧客数: {sim.customers_served} サービス済')
+
+            # Rescaling invalidates the blit background, so redraw the
+            # whole figure only when the data outgrows the y-axis
+            if k > start:
+                rescaled = False
+                for ax, values in ((ax1, sim.queue_length_history),
+                                   (ax2, sim.customers_in_system_history)):
+                    peak = values[start:k].max()
+                    if peak >= ax.get_ylim()[1]:
+                        ax.set_ylim(0, peak * 2)
+                        rescaled = True
+                if rescaled:
+                    fig.canvas.draw()
+
+            return line1, line2, time_text, served_text
+
+        anim = FuncAnimation(fig, update, init_func=init, frames=200,
+                             interval=50, repeat=False, blit=True)
         plt.show()
 
     def run(self):
@@ -349,6 +379,50 @@ class InteractiveQueueSimulator:
                 input("\n無効な選択です。Enterキーを押して続行...")
 
 
-if __name__ == '__main__':
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description='待ち行列シミュレーション')
+    parser.add_argument('--servers', type=int, help='サーバー数 (c)')
+    parser.add_argument('--arrival-rate', type=float, help='到着率 (λ)')
+    parser.add_argument('--service-rate', type=float, help='サービス率 (μ)')
+    parser.add_argument('--max-time', type=float, help='シミュレーション時間')
+    parser.add_argument('--save', metavar='PATH',
+                        help='メニューを表示せずにシミュレーションを実行し、グラフをPNGに保存')
+    args = parser.parse_args()
+
+    # set_parameters と同じ範囲チェック (NaN も拒否する)
+    if args.servers is not None and args.servers < 1:
+        parser.error('サーバー数は1以上である必要があります')
+    if args.arrival_rate is not None and not args.arrival_rate > 0:
+        parser.error('到着率は正の数である必要があります')
+    if args.service_rate is not None and not args.service_rate > 0:
+        parser.error('サービス率は正の数である必要があります')
+    if args.max_time is not None and not args.max_time > 0:
+        parser.error('シミュレーション時間は正の数である必要があります')
+
     app = InteractiveQueueSimulator()
-    app.run()
+    if args.servers is not None:
+        app.num_servers = args.servers
+    if args.arrival_rate is not None:
+        app.arrival_rate = args.arrival_rate
+    if args.service_rate is not None:
+        app.service_rate = args.service_rate
+    if args.max_time is not None:
+        app.max_time = args.max_time
+
+    if args.save:
+        app.sim = QueueSimulation(
+            num_servers=app.num_servers,
+            arrival_rate=app.arrival_rate,
+            service_rate=app.service_rate
+        )
+        app.sim.run(max_time=app.max_time, max_customers=app.max_customers,
+                    record_history=True)
+        app.plot_results(args.save)
+        print(f"✓ グラフを保存しました: {args.save}")
+    else:
+        app.run()
+
+
+if __name__ == '__main__':
+    main()
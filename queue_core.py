@@ -0,0 +1,392 @@
+"""
+Compiled Simulation Core
+Numba kernels implementing the M/M/c event loop on NumPy arrays
+"""
+
+import numpy as np
+from numba import njit, prange
+
+
+# Initial capacity of the history buffers
+HISTORY_CAPACITY = 1024
+
+# Initial capacity of the per-customer buffers (a power of two, since they
+# are indexed by customer id & (capacity - 1))
+CUSTOMER_CAPACITY = 1024
+
+# Columns of the statistics table filled by _run_batch
+BATCH_STATS = (
+    'customers_served',
+    'avg_waiting_time',
+    'avg_system_time',
+    'avg_queue_length',
+    'server_utilization',
+)
+
+# Scalar simulation state shared with the compiled event loop
+STATE_DTYPE = np.dtype([
+    ('current_time', np.float64),
+    ('total_waiting_time', np.float64),
+    ('total_system_time', np.float64),
+    ('queue_length_sum', np.float64),
+    ('busy_time_sum', np.float64),
+    ('history_acc', np.float64),
+    ('busy_servers', np.int64),
+    ('next_customer_id', np.int64),
+    ('customers_arrived', np.int64),
+    ('customers_started', np.int64),
+    ('customers_served', np.int64),
+    ('max_queue_length', np.int64),
+    ('n_samples', np.int64),
+])
+
+
+@njit(cache=True)
+def _heap_push(keys, ids, size, t, cid):
+    """Push (t, cid) onto the array-backed min-heap, return the new size"""
+    i = size
+    while i > 0:
+        parent = (i - 1) >> 1
+        if keys[parent] <= t:
+            break
+        keys[i] = keys[parent]
+        ids[i] = ids[parent]
+        i = parent
+    keys[i] = t
+    ids[i] = cid
+    return size + 1
+
+
+@njit(cache=True)
+def _heap_pop(keys, ids, size):
+    """Pop the smallest key, return (key, id, new size)"""
+    t = keys[0]
+    cid = ids[0]
+    size -= 1
+    if size > 0:
+        last_t = keys[size]
+        last_id = ids[size]
+        i = 0
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[child + 1] < keys[child]:
+                child += 1
+            if keys[child] >= last_t:
+                break
+            keys[i] = keys[child]
+            ids[i] = ids[child]
+            i = child
+        keys[i] = last_t
+        ids[i] = last_id
+    return t, cid, size
+
+
+@njit(cache=True)
+def _grow(a):
+    """Return a copy of ``a`` with twice the capacity"""
+    out = np.empty(2 * a.shape[0], dtype=a.dtype)
+    out[:a.shape[0]] = a
+    return out
+
+
+@njit(cache=True)
+def _grow_ring(a, lo, hi):
+    """
+    Return a per-customer ring buffer with twice the capacity
+
+    Entries are indexed by customer id & (capacity - 1); those of the ids
+    in [lo, hi) are carried over.
+    """
+    old_mask = a.shape[0] - 1
+    out = np.empty(2 * a.shape[0], dtype=a.dtype)
+    mask = out.shape[0] - 1
+    for i in range(lo, hi):
+        out[i & mask] = a[i & old_mask]
+    return out
+
+
+@njit(cache=True)
+def _oldest_customer(customers_started, busy_servers, server_cust_ids):
+    """Smallest customer id that is still waiting or in service"""
+    oldest = customers_started
+    for k in range(busy_servers):
+        if server_cust_ids[k] < oldest:
+            oldest = server_cust_ids[k]
+    return oldest
+
+
+@njit(cache=True)
+def _seed(seed):
+    """Seed the random generator used by compiled code"""
+    np.random.seed(seed)
+
+
+@njit(cache=True, nogil=True)
+def _step_until(state, target_time, max_customers, num_servers, lam, mu,
+                history_fraction, keep_customers, server_free_times, server_cust_ids,
+                arrival_times, service_start_times, departure_times,
+                hist_t, hist_q, hist_n):
+    """
+    Compiled M/M/c event loop, advancing ``state`` in place
+
+    No general event queue is needed. Arrivals form a monotone stream, so
+    the only pending arrival is that of the last scheduled customer, and
+    departures are kept in a min-heap of the busy servers' free times,
+    which never holds more than num_servers entries.
+
+    Customers are served FIFO, so they start service in id order and the
+    waiting queue is the id range [customers_started, customers_arrived)
+    of the per-customer buffers. These are ring buffers indexed by
+    id & (capacity - 1): unless keep_customers is set, the slots of
+    departed customers are reused, so their size follows the number of
+    customers in the system rather than the number simulated.
+
+    Args:
+        state: One-element STATE_DTYPE array
+        target_time: Process events up to and including this time
+        max_customers: Stop once this many customers are served (0 for unlimited)
+        num_servers: Number of servers
+        lam: Arrival rate
+        mu: Service rate per server
+        history_fraction: Fraction of events recorded in the history,
+            spread evenly by a deterministic accumulator
+        keep_customers: Never reuse per-customer slots, keeping the times of
+            every customer indexed by id
+        server_free_times, server_cust_ids: Departure heap of the busy servers
+        arrival_times, service_start_times, departure_times: Per-customer buffers
+        hist_t, hist_q, hist_n: History buffers
+
+    Returns:
+        True if a per-customer or history buffer is full and must be
+        grown before calling again
+    """
+    s = state[0]
+    arrival_scale = 1.0 / lam
+    service_scale = 1.0 / mu
+    customer_capacity = arrival_times.shape[0]
+    mask = customer_capacity - 1
+    # Lower bound on the oldest customer still waiting or in service,
+    # refreshed only when the ring buffers look full
+    oldest = 0
+    history_capacity = hist_t.shape[0]
+    if max_customers <= 0:
+        max_customers = np.iinfo(np.int64).max
+
+    current_time = s.current_time
+    busy = s.busy_servers
+    next_id = s.next_customer_id
+    n_arrived = s.customers_arrived
+    n_started = s.customers_started
+    served = s.customers_served
+    total_wait = s.total_waiting_time
+    total_sys = s.total_system_time
+    q_sum = s.queue_length_sum
+    busy_sum = s.busy_time_sum
+    max_q = s.max_queue_length
+    history_acc = s.history_acc
+    n_samples = s.n_samples
+
+    if next_id == 0:
+        # Schedule first arrival
+        arrival_times[0] = np.random.exponential(arrival_scale)
+        service_start_times[0] = np.nan
+        departure_times[0] = np.nan
+        next_id = 1
+
+    full = False
+    while True:
+        # Next event: the earlier of the pending arrival and the first departure
+        t = arrival_times[(next_id - 1) & mask]
+        is_departure = busy > 0 and server_free_times[0] <= t
+        if is_departure:
+            t = server_free_times[0]
+
+        if t > target_time:
+            break
+        if served >= max_customers:
+            break
+        if next_id - oldest >= customer_capacity and not keep_customers:
+            oldest = _oldest_customer(n_started, busy, server_cust_ids)
+        if next_id - oldest >= customer_capacity or n_samples == history_capacity:
+            full = True
+            break
+
+        # Time-weighted statistics
+        dt = t - current_time
+        q = n_arrived - n_started
+        q_sum += q * dt
+        busy_sum += busy * dt
+        if q > max_q:
+            max_q = q
+        current_time = t
+
+        if not is_departure:
+            cid = next_id - 1
+            n_arrived += 1
+            if busy < num_servers:
+                busy = _heap_push(server_free_times, server_cust_ids, busy,
+                                  t + np.random.exponential(service_scale), cid)
+                service_start_times[cid & mask] = t
+                n_started += 1
+            # Schedule next arrival
+            k = next_id & mask
+            arrival_times[k] = t + np.random.exponential(arrival_scale)
+            service_start_times[k] = np.nan
+            departure_times[k] = np.nan
+            next_id += 1
+        else:
+            _, cid, busy = _heap_pop(server_free_times, server_cust_ids, busy)
+            served += 1
+            k = cid & mask
+            departure_times[k] = t
+            total_wait += service_start_times[k] - arrival_times[k]
+            total_sys += t - arrival_times[k]
+            if n_started < n_arrived:
+                # Serve next customer from queue
+                busy = _heap_push(server_free_times, server_cust_ids, busy,
+                                  t + np.random.exponential(service_scale), n_started)
+                service_start_times[n_started & mask] = t
+                n_started += 1
+
+        # Record history
+        history_acc += history_fraction
+        if history_acc >= 1.0:
+            history_acc -= 1.0
+            hist_t[n_samples] = t
+            hist_q[n_samples] = n_arrived - n_started
+            hist_n[n_samples] = n_arrived - n_started + busy
+            n_samples += 1
+
+    s.current_time = current_time
+    s.busy_servers = busy
+    s.next_customer_id = next_id
+    s.customers_arrived = n_arrived
+    s.customers_started = n_started
+    s.customers_served = served
+    s.total_waiting_time = total_wait
+    s.total_system_time = total_sys
+    s.queue_length_sum = q_sum
+    s.busy_time_sum = busy_sum
+    s.max_queue_length = max_q
+    s.history_acc = history_acc
+    s.n_samples = n_samples
+    return full
+
+
+@njit(cache=True)
+def _lindley(arrival_times, service_times, num_servers, service_start_times,
+             departure_times):
+    """
+    FIFO M/M/c recurrence over pre-drawn arrival and service times
+
+    Each customer takes the server that frees up first, which for one
+    server reduces to Lindley's recursion
+    departure[i] = max(arrival[i], departure[i - 1]) + service[i].
+
+    Args:
+        arrival_times: Sorted arrival times
+        service_times: Service time of each customer
+        num_servers: Number of servers
+        service_start_times, departure_times: Output arrays
+    """
+    free_times = np.zeros(num_servers, dtype=np.float64)
+    server_ids = np.zeros(num_servers, dtype=np.int64)
+    for i in range(arrival_times.shape[0]):
+        free, _, size = _heap_pop(free_times, server_ids, num_servers)
+        start = max(arrival_times[i], free)
+        service_start_times[i] = start
+        departure_times[i] = start + service_times[i]
+        _heap_push(free_times, server_ids, size, departure_times[i], 0)
+
+
+@njit(cache=True)
+def _erlang_c_stats(c, lam, mu):
+    """
+    Closed-form M/M/c steady-state statistics
+
+    Args:
+        c: Number of servers
+        lam: Arrival rate
+        mu: Service rate per server
+
+    Returns:
+        Tuple (rho, L, Lq, W, Wq); all but rho are NaN when rho >= 1
+    """
+    rho = lam / (c * mu)
+    if rho >= 1.0:
+        return rho, np.nan, np.nan, np.nan, np.nan
+
+    # P0, building (c*rho)^n / n! by recurrence
+    cr = c * rho
+    term = 1.0
+    sum_term = 1.0
+    for n in range(1, c):
+        term *= cr / n
+        sum_term += term
+    erlang_c_term = term * cr / (c * (1.0 - rho))
+
+    # Erlang C formula (probability of waiting)
+    C = erlang_c_term / (sum_term + erlang_c_term)
+
+    Lq = C * rho / (1.0 - rho)
+    Wq = Lq / lam
+    W = Wq + 1.0 / mu
+    L = lam * W
+    return rho, L, Lq, W, Wq
+
+
+@njit(cache=True)
+def _simulate(num_servers, lam, mu, max_time, seed, out):
+    """
+    Run one simulation from scratch and write its statistics to ``out``
+
+    No history is recorded, and the per-customer buffers are reused as
+    ring buffers.
+
+    Args:
+        num_servers: Number of servers
+        lam: Arrival rate
+        mu: Service rate per server
+        max_time: Simulation time
+        seed: Seed for the random generator (negative to leave it unseeded)
+        out: Array receiving the BATCH_STATS values
+    """
+    if seed >= 0:
+        np.random.seed(seed)
+    state = np.zeros(1, dtype=STATE_DTYPE)
+    server_free_times = np.empty(num_servers, dtype=np.float64)
+    server_cust_ids = np.empty(num_servers, dtype=np.int64)
+    arrival_times = np.empty(CUSTOMER_CAPACITY, dtype=np.float64)
+    service_start_times = np.empty(CUSTOMER_CAPACITY, dtype=np.float64)
+    departure_times = np.empty(CUSTOMER_CAPACITY, dtype=np.float64)
+    hist_t = np.empty(1, dtype=np.float64)
+    hist_q = np.empty(1, dtype=np.int64)
+    hist_n = np.empty(1, dtype=np.int64)
+
+    s = state[0]
+    while _step_until(state, max_time, 0, num_servers, lam, mu, 0.0, False,
+                      server_free_times, server_cust_ids,
+                      arrival_times, service_start_times, departure_times,
+                      hist_t, hist_q, hist_n):
+        lo = _oldest_customer(s.customers_started, s.busy_servers, server_cust_ids)
+        hi = s.next_customer_id
+        arrival_times = _grow_ring(arrival_times, lo, hi)
+        service_start_times = _grow_ring(service_start_times, lo, hi)
+        departure_times = _grow_ring(departure_times, lo, hi)
+
+    out[:] = 0.0
+    out[0] = s.customers_served
+    if s.customers_served > 0 and s.current_time > 0:
+        out[1] = s.total_waiting_time / s.customers_served
+        out[2] = s.total_system_time / s.customers_served
+        out[3] = s.queue_length_sum / s.current_time
+        out[4] = s.busy_time_sum / (s.current_time * num_servers)
+
+
+@njit(parallel=True, cache=True)
+def _run_batch(lams, mus, cs, max_times, seeds, out_stats):
+    """Run independent simulations for each parameter set in parallel"""
+    for i in prange(lams.shape[0]):
+        _simulate(cs[i], lams[i], mus[i], max_times[i], seeds[i], out_stats[i])
@@ -3,33 +3,94 @@ Queue Simulation Engine
 Implements discrete event simulation for various queuing models
 """
 
-import heapq
-import random
-import math
-from dataclasses import dataclass
-from typing import List, Tuple
-from collections import deque
-
-
-@dataclass
-class Customer:
-    """Represents a customer in the queue"""
-    id: int
-    arrival_time: float
-    service_start_time: float = None
-    departure_time: float = None
+from functools import lru_cache
 
-    @property
-    def waiting_time(self):
-        if self.service_start_time is None:
-            return None
-        return self.service_start_time - self.arrival_time
+import numpy as np
 
-    @property
-    def system_time(self):
-        if self.departure_time is None:
-            return None
-        return self.departure_time - self.arrival_time
+from queue_core import (
+    BATCH_STATS,
+    CUSTOMER_CAPACITY,
+    HISTORY_CAPACITY,
+    STATE_DTYPE,
+    _erlang_c_stats,
+    _grow,
+    _grow_ring,
+    _lindley,
+    _oldest_customer,
+    _run_batch,
+    _seed,
+    _step_until,
+)
+
+
+# Number of variates drawn at once by the Python-side generators
+POOL_SIZE = 4096
+
+
+def _state_field(name, doc):
+    """Read-only attribute backed by a field of the simulation state"""
+    return property(lambda self: self.state[name][0].item(), doc=doc)
+
+
+def decimate(t, y, n_out):
+    """
+    Min-max decimation of a time series for plotting
+
+    Splits the series into at most n_out bins of equal index width (the
+    last one possibly shorter) and keeps the minimum and maximum sample of
+    each bin, which preserves the envelope of step-like traces such as
+    queue lengths.
+
+    Args:
+        t: Sample times
+        y: Sample values
+        n_out: Maximum number of bins (at most 2 * n_out points are kept)
+
+    Returns:
+        Tuple of decimated (t, y) arrays
+    """
+    n = len(t)
+    if n <= 2 * n_out:
+        return t, y
+    width = -(-n // n_out)
+    n_full = n // width
+    m = n_full * width
+    bins = y[:m].reshape(n_full, width)
+    base = np.arange(n_full) * width
+    lo = base + bins.argmin(axis=1)
+    hi = base + bins.argmax(axis=1)
+    if m < n:
+        # Partial last bin
+        lo = np.append(lo, m + y[m:].argmin())
+        hi = np.append(hi, m + y[m:].argmax())
+    idx = np.column_stack((np.minimum(lo, hi), np.maximum(lo, hi))).ravel()
+    # Bins whose minimum and maximum coincide contribute a single sample
+    idx = idx[np.concatenate(([True], np.diff(idx) > 0))]
+    return t[idx], y[idx]
+
+
+@lru_cache(maxsize=128)
+def _theoretical_statistics(c, lambda_rate, mu):
+    """
+    Theoretical M/M/c statistics, memoized on (c, lambda, mu)
+
+    Callers must copy the returned dict before handing it out.
+    """
+    rho, L, Lq, W, Wq = _erlang_c_stats(int(c), float(lambda_rate), float(mu))
+
+    if rho >= 1:
+        return {
+            'utilization': rho,
+            'note': 'System is unstable (ρ >= 1)'
+        }
+
+    return {
+        'utilization': rho,
+        'avg_customers_in_system': L,
+        'avg_customers_in_queue': Lq,
+        'avg_time_in_system': W,
+        'avg_time_in_queue': Wq,
+    }
 
 
 class QueueSimulation:
@@ -38,7 +99,21 @@ class QueueSimulation:
     Supports M/M/1, M/M/c, and other queuing models
     """
 
-    def __init__(self, num_servers=1, arrival_rate=1.0, service_rate=1.5):
+    current_time = _state_field('current_time', 'Time of the last processed event')
+    busy_servers = _state_field('busy_servers', 'Number of busy servers')
+    next_customer_id = _state_field('next_customer_id', 'Id of the next customer to schedule')
+    customers_arrived = _state_field('customers_arrived', 'Number of arrived customers')
+    customers_started = _state_field('customers_started', 'Number of customers who started service')
+    customers_served = _state_field('customers_served', 'Number of served customers')
+    total_waiting_time = _state_field('total_waiting_time', 'Sum of waiting times of served customers')
+    total_system_time = _state_field('total_system_time', 'Sum of system times of served customers')
+    queue_length_sum = _state_field('queue_length_sum', 'Time integral of the queue length')
+    busy_time_sum = _state_field('busy_time_sum', 'Time integral of the number of busy servers')
+    max_queue_length = _state_field('max_queue_length', 'Longest queue observed')
+    n_samples = _state_field('n_samples', 'Number of valid history samples')
+
+    def __init__(self, num_servers=1, arrival_rate=1.0, service_rate=1.5,
+                 history_fraction=1.0, keep_customer_times=False):
         """
         Initialize the queue simulation
 
@@ -46,137 +121,271 @@ class QueueSimulation:
             num_servers: Number of servers (c in M/M/c)
             arrival_rate: Lambda (arrivals per time unit)
             service_rate: Mu (services per time unit per server)
+            history_fraction: Fraction of events recorded in the history when
+                it is requested (evenly spaced; 1.0 records every event)
+            keep_customer_times: Keep the times of every customer for
+                get_customer_times (memory grows with the number of customers)
         """
         self.num_servers = num_servers
         self.arrival_rate = arrival_rate
         self.service_rate = service_rate
+        self.history_fraction = history_fraction
+        self.keep_customer_times = keep_customer_times
 
         # Simulation state
-        self.current_time = 0.0
-        self.event_queue = []  # Priority queue of (time, event_type, data)
-        self.waiting_queue = deque()  # Customers waiting for service
-        self.busy_servers = 0
-        self.next_customer_id = 0
-
-        # Statistics
-        self.customers_arrived = 0
-        self.customers_served = 0
-        self.total_waiting_time = 0.0
-        self.total_system_time = 0.0
-        self.queue_length_sum = 0.0
-        self.last_event_time = 0.0
-        self.max_queue_length = 0
-
-        # History for plotting
-        self.time_history = []
-        self.queue_length_history = []
-        self.customers_in_system_history = []
+        self.state = np.zeros(1, dtype=STATE_DTYPE)
+        self.horizon = 0.0  # Time up to which events have been processed
+
+        # Min-heap of the busy servers' free times and their customers
+        self.server_free_times = np.empty(num_servers, dtype=np.float64)
+        self.server_cust_ids = np.empty(num_servers, dtype=np.int64)
+
+        # Per-customer times indexed by customer id & (capacity - 1), valid
+        # for the customers still in the system (for every id below
+        # next_customer_id with keep_customer_times); NaN until service
+        # starts / the customer departs
+        self.arrival_times = np.empty(CUSTOMER_CAPACITY, dtype=np.float64)
+        self.service_start_times = np.empty(CUSTOMER_CAPACITY, dtype=np.float64)
+        self.departure_times = np.empty(CUSTOMER_CAPACITY, dtype=np.float64)
+
+        # History for plotting, valid up to n_samples
+        self.time_history = np.empty(HISTORY_CAPACITY, dtype=np.float64)
+        self.queue_length_history = np.empty(HISTORY_CAPACITY, dtype=np.int64)
+        self.customers_in_system_history = np.empty(HISTORY_CAPACITY, dtype=np.int64)
+
+        # Pools of pre-drawn variates for the generate_* methods
+        self._set_rng(np.random.default_rng())
+
+    def _set_rng(self, rng):
+        """Use rng for the generate_* methods and empty their pools"""
+        self._rng = rng
+        # Pools are drawn on first use; the compiled kernels have their own RNG
+        self._arr_cur = POOL_SIZE
+        self._svc_cur = POOL_SIZE
+
+    def _refill_arrivals(self):
+        """Draw a new pool of interarrival times"""
+        self._arr_pool = self._rng.exponential(1 / self.arrival_rate, POOL_SIZE)
+        self._arr_cur = 0
+
+    def _refill_services(self):
+        """Draw a new pool of service times"""
+        self._svc_pool = self._rng.exponential(1 / self.service_rate, POOL_SIZE)
+        self._svc_cur = 0
+
+    @property
+    def queue_length(self):
+        """Number of customers waiting for service"""
+        return self.customers_arrived - self.customers_started
 
     def reset(self):
         """Reset the simulation to initial state"""
-        self.__init__(self.num_servers, self.arrival_rate, self.service_rate)
+        self.reset_state()
 
-    def schedule_event(self, time: float, event_type: str, data=None):
-        """Schedule an event in the future"""
-        heapq.heappush(self.event_queue, (time, event_type, data))
+    def reset_state(self):
+        """
+        Reset the simulation to initial state, keeping the allocated buffers
+
+        Cheaper than constructing a new simulation when running many
+        replicates, since grown per-customer and history buffers are reused.
+        """
+        self.state[:] = 0
+        self.horizon = 0.0
+        if len(self.server_free_times) != self.num_servers:
+            self.server_free_times = np.empty(self.num_servers, dtype=np.float64)
+            self.server_cust_ids = np.empty(self.num_servers, dtype=np.int64)
+        self._set_rng(np.random.default_rng())
 
     def generate_interarrival_time(self):
         """Generate exponentially distributed interarrival time"""
-        return random.expovariate(self.arrival_rate)
+        if self._arr_cur == POOL_SIZE:
+            self._refill_arrivals()
+        value = self._arr_pool[self._arr_cur]
+        self._arr_cur += 1
+        return float(value)
 
     def generate_service_time(self):
         """Generate exponentially distributed service time"""
-        return random.expovariate(self.service_rate)
-
-    def update_statistics(self, time_delta: float):
-        """Update time-weighted statistics"""
-        queue_length = len(self.waiting_queue)
-        self.queue_length_sum += queue_length * time_delta
-        self.max_queue_length = max(self.max_queue_length, queue_length)
-
-    def handle_arrival(self, customer: Customer):
-        """Handle customer arrival event"""
-        self.customers_arrived += 1
-
-        if self.busy_servers < self.num_servers:
-            # Server available, start service immediately
-            self.busy_servers += 1
-            customer.service_start_time = self.current_time
-            service_time = self.generate_service_time()
-            departure_time = self.current_time + service_time
-            self.schedule_event(departure_time, 'departure', customer)
-        else:
-            # All servers busy, join the queue
-            self.waiting_queue.append(customer)
-
-        # Schedule next arrival
-        next_arrival_time = self.current_time + self.generate_interarrival_time()
-        next_customer = Customer(id=self.next_customer_id, arrival_time=next_arrival_time)
-        self.next_customer_id += 1
-        self.schedule_event(next_arrival_time, 'arrival', next_customer)
-
-    def handle_departure(self, customer: Customer):
-        """Handle customer departure event"""
-        customer.departure_time = self.current_time
-        self.customers_served += 1
-        self.total_waiting_time += customer.waiting_time
-        self.total_system_time += customer.system_time
-
-        if self.waiting_queue:
-            # Serve next customer from queue
-            next_customer = self.waiting_queue.popleft()
-            next_customer.service_start_time = self.current_time
-            service_time = self.generate_service_time()
-            departure_time = self.current_time + service_time
-            self.schedule_event(departure_time, 'departure', next_customer)
-        else:
-            # No one waiting, server becomes idle
-            self.busy_servers -= 1
-
-    def run(self, max_time: float = None, max_customers: int = None):
+        if self._svc_cur == POOL_SIZE:
+            self._refill_services()
+        value = self._svc_pool[self._svc_cur]
+        self._svc_cur += 1
+        return float(value)
+
+    def _reserve_history(self, capacity):
+        """Grow the history buffers to hold at least capacity samples"""
+        if capacity <= len(self.time_history):
+            return
+        n = self.n_samples
+        for name in ('time_history', 'queue_length_history', 'customers_in_system_history'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:n] = old[:n]
+            setattr(self, name, new)
+
+    def run_until(self, target_time: float, max_customers: int = None,
+                  record_history: bool = False):
+        """
+        Process all events up to target_time
+
+        Can be called repeatedly to advance the simulation in steps.
+
+        Args:
+            target_time: Simulation time to advance to
+            max_customers: Maximum number of customers to serve (None for unlimited)
+            record_history: Record the queue history for plotting
+        """
+        self.horizon = max(self.horizon, target_time)
+        while _step_until(
+            self.state, target_time, max_customers if max_customers else 0,
+            self.num_servers, self.arrival_rate, self.service_rate,
+            self.history_fraction if record_history else 0.0,
+            self.keep_customer_times, self.server_free_times, self.server_cust_ids,
+            self.arrival_times, self.service_start_times, self.departure_times,
+            self.time_history, self.queue_length_history,
+            self.customers_in_system_history,
+        ):
+            lo = 0 if self.keep_customer_times else _oldest_customer(
+                self.customers_started, self.busy_servers, self.server_cust_ids)
+            hi = self.next_customer_id
+            if hi - lo >= len(self.arrival_times):
+                self.arrival_times = _grow_ring(self.arrival_times, lo, hi)
+                self.service_start_times = _grow_ring(self.service_start_times, lo, hi)
+                self.departure_times = _grow_ring(self.departure_times, lo, hi)
+            if self.n_samples == len(self.time_history):
+                self.time_history = _grow(self.time_history)
+                self.queue_length_history = _grow(self.queue_length_history)
+                self.customers_in_system_history = _grow(self.customers_in_system_history)
+
+    def run_chunk(self, duration: float, max_customers: int = None,
+                  record_history: bool = False):
+        """
+        Advance the simulation by duration time units
+
+        Args:
+            duration: Length of simulated time to process
+            max_customers: Maximum number of customers to serve (None for unlimited)
+            record_history: Record the queue history for plotting
+        """
+        self.run_until(self.horizon + duration, max_customers, record_history)
+
+    def run(self, max_time: float = None, max_customers: int = None, seed: int = None,
+            record_history: bool = False):
         """
         Run the simulation
 
         Args:
             max_time: Maximum simulation time (None for unlimited)
             max_customers: Maximum number of customers to serve (None for unlimited)
+            seed: Random seed (None for a non-reproducible run)
+            record_history: Record the queue history for plotting
         """
-        # Schedule first arrival
-        first_arrival_time = self.generate_interarrival_time()
-        first_customer = Customer(id=self.next_customer_id, arrival_time=first_arrival_time)
-        self.next_customer_id += 1
-        self.schedule_event(first_arrival_time, 'arrival', first_customer)
-
-        while self.event_queue:
-            # Get next event
-            event_time, event_type, data = heapq.heappop(self.event_queue)
-
-            # Check termination conditions
-            if max_time and event_time > max_time:
-                break
-            if max_customers and self.customers_served >= max_customers:
-                break
-
-            # Update statistics
-            time_delta = event_time - self.last_event_time
-            self.update_statistics(time_delta)
-
-            # Update current time
-            self.current_time = event_time
-            self.last_event_time = event_time
-
-            # Record history
-            self.time_history.append(self.current_time)
-            self.queue_length_history.append(len(self.waiting_queue))
-            self.customers_in_system_history.append(
-                len(self.waiting_queue) + self.busy_servers
+        if seed is not None:
+            _seed(seed)
+            self._set_rng(np.random.default_rng(seed))
+        if record_history and max_time:
+            # Size the history for the expected ~2 events per arrival up front
+            self._reserve_history(
+                self.n_samples
+                + int(2 * self.arrival_rate * max_time * self.history_fraction) + 1024
             )
+        self.run_until(max_time if max_time else np.inf, max_customers, record_history)
+
+    def run_fast(self, n_customers: int, seed: int = None):
+        """
+        Simulate a fixed number of customers without event handling
+
+        All interarrival and service times are drawn up front and the FIFO
+        recurrence for start and departure times runs in compiled code.
+        The state of this simulation is not modified.
+
+        Args:
+            n_customers: Number of customers to simulate
+            seed: Random seed (None for a non-reproducible run)
+
+        Returns:
+            Dict of statistics over the n_customers customers
+        """
+        rng = np.random.default_rng(seed)
+        arrivals = np.cumsum(rng.exponential(1 / self.arrival_rate, n_customers))
+        services = rng.exponential(1 / self.service_rate, n_customers)
+        starts = np.empty(n_customers, dtype=np.float64)
+        departures = np.empty(n_customers, dtype=np.float64)
+        _lindley(arrivals, services, self.num_servers, starts, departures)
+
+        # All customers have left by the last departure, so the time
+        # integrals of queue length and busy servers are plain sums
+        end_time = departures.max()
+        waits = starts - arrivals
+        return {
+            'customers_served': n_customers,
+            'avg_waiting_time': float(waits.mean()),
+            'avg_system_time': float((departures - arrivals).mean()),
+            'avg_queue_length': float(waits.sum() / end_time),
+            'server_utilization': float(services.sum() / (end_time * self.num_servers)),
+        }
+
+    def run_batch(self, arrival_rates, max_time: float, service_rates=None,
+                  num_servers=None, seed: int = None):
+        """
+        Run independent simulations for many parameter sets in parallel
+
+        Parameters that are not given default to this simulation's values;
+        all parameters are broadcast against each other. The state of this
+        simulation is not modified.
+
+        Args:
+            arrival_rates: Lambda for each run
+            max_time: Simulation time of each run
+            service_rates: Mu for each run
+            num_servers: Number of servers for each run
+            seed: Base random seed (run i uses seed + i; None for unseeded)
+
+        Returns:
+            Dict mapping each name in BATCH_STATS to an array of results
+        """
+        lams, mus, cs, max_times = np.broadcast_arrays(
+            np.asarray(arrival_rates, dtype=np.float64),
+            np.asarray(self.service_rate if service_rates is None else service_rates,
+                       dtype=np.float64),
+            np.asarray(self.num_servers if num_servers is None else num_servers,
+                       dtype=np.int64),
+            np.asarray(max_time, dtype=np.float64),
+        )
+        shape = lams.shape
+        n = lams.size
+        seeds = np.full(n, -1, dtype=np.int64) if seed is None else seed + np.arange(n)
+
+        out_stats = np.empty((n, len(BATCH_STATS)), dtype=np.float64)
+        _run_batch(lams.flatten(), mus.flatten(), cs.flatten(), max_times.flatten(),
+                   seeds, out_stats)
+        return {
+            name: out_stats[:, i].reshape(shape)
+            for i, name in enumerate(BATCH_STATS)
+        }
 
-            # Handle event
-            if event_type == 'arrival':
-                self.handle_arrival(data)
-            elif event_type == 'departure':
-                self.handle_departure(data)
+    def run_replicates(self, n_replicates: int, max_time: float, seed: int = None):
+        """
+        Run independent replicates of this simulation's parameters in parallel
+
+        Args:
+            n_replicates: Number of replicates
+            max_time: Simulation time of each replicate
+            seed: Base random seed (replicate i uses seed + i; None for unseeded)
+
+        Returns:
+            Dict with 'mean' and 'std' (sample standard deviation), each
+            mapping the names in BATCH_STATS to floats, and 'results' with
+            the per-replicate arrays
+        """
+        results = self.run_batch(np.full(n_replicates, self.arrival_rate),
+                                 max_time, seed=seed)
+        ddof = 1 if n_replicates > 1 else 0
+        return {
+            'mean': {name: float(v.mean()) for name, v in results.items()},
+            'std': {name: float(v.std(ddof=ddof)) for name, v in results.items()},
+            'results': results,
+        }
 
     def get_statistics(self):
         """Get current simulation statistics"""
@@ -189,14 +398,14 @@ class QueueSimulation:
                 'avg_queue_length': 0,
                 'max_queue_length': 0,
                 'server_utilization': 0,
-                'current_queue_length': len(self.waiting_queue),
+                'current_queue_length': self.queue_length,
                 'busy_servers': self.busy_servers,
             }
 
         avg_waiting_time = self.total_waiting_time / self.customers_served
         avg_system_time = self.total_system_time / self.customers_served
         avg_queue_length = self.queue_length_sum / self.current_time if self.current_time > 0 else 0
-        server_utilization = (self.customers_served * (self.total_system_time / self.customers_served - avg_waiting_time)) / (self.current_time * self.num_servers) if self.current_time > 0 else 0
+        server_utilization = self.busy_time_sum / (self.current_time * self.num_servers) if self.current_time > 0 else 0
 
         return {
             'customers_arrived': self.customers_arrived,
@@ -206,50 +415,36 @@ class QueueSimulation:
             'avg_queue_length': avg_queue_length,
             'max_queue_length': self.max_queue_length,
             'server_utilization': server_utilization,
-            'current_queue_length': len(self.waiting_queue),
+            'current_queue_length': self.queue_length,
             'busy_servers': self.busy_servers,
             'current_time': self.current_time,
         }
 
-    def get_theoretical_statistics(self):
-        """Calculate theoretical statistics for M/M/c queue"""
-        rho = self.arrival_rate / (self.num_servers * self.service_rate)
-
-        if rho >= 1:
-            return {
-                'utilization': rho,
-                'note': 'System is unstable (ρ >= 1)'
-            }
+    def get_customer_times(self):
+        """
+        Per-customer waiting and system times of the customers served so far
 
-        if self.num_servers == 1:
-            # M/M/1 formulas
-            L = self.arrival_rate / (self.service_rate - self.arrival_rate)
-            Lq = (self.arrival_rate ** 2) / (self.service_rate * (self.service_rate - self.arrival_rate))
-            W = 1 / (self.service_rate - self.arrival_rate)
-            Wq = self.arrival_rate / (self.service_rate * (self.service_rate - self.arrival_rate))
-        else:
-            # M/M/c formulas (Erlang C)
-            c = self.num_servers
-            lambda_rate = self.arrival_rate
-            mu = self.service_rate
-
-            # Calculate P0
-            sum_term = sum((c * rho) ** n / math.factorial(n) for n in range(c))
-            erlang_c_term = ((c * rho) ** c) / (math.factorial(c) * (1 - rho))
-            P0 = 1 / (sum_term + erlang_c_term)
-
-            # Erlang C formula (probability of waiting)
-            C = erlang_c_term * P0
-
-            Lq = C * rho / (1 - rho)
-            Wq = Lq / lambda_rate
-            W = Wq + 1 / mu
-            L = lambda_rate * W
+        Computed by vectorized reductions over the per-customer arrays, so
+        the totals agree with total_waiting_time and total_system_time.
+        Requires keep_customer_times.
 
+        Returns:
+            Dictionary of float64 arrays indexed in order of arrival
+        """
+        if not self.keep_customer_times:
+            raise RuntimeError('get_customer_times requires keep_customer_times=True')
+        n = self.customers_started
+        start = self.service_start_times[:n]
+        departure = self.departure_times[:n]
+        served = ~np.isnan(departure)
+        arrival = self.arrival_times[:n][served]
         return {
-            'utilization': rho,
-            'avg_customers_in_system': L,
-            'avg_customers_in_queue': Lq,
-            'avg_time_in_system': W,
-            'avg_time_in_queue': Wq,
+            'arrival_time': arrival,
+            'waiting_time': start[served] - arrival,
+            'system_time': departure[served] - arrival,
         }
+
+    def get_theoretical_statistics(self):
+        """Calculate theoretical statistics for M/M/c queue"""
+        return dict(_theoretical_statistics(
+            self.num_servers, self.arrival_rate, self.service_rate))
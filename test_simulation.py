@@ -3,7 +3,10 @@
 Simple test script for queue simulation
 """
 
-from queue_simulation import QueueSimulation
+import numpy as np
+
+from queue_simulation import QueueSimulation, decimate
+from queue_core import _heap_push, _heap_pop
 
 def test_mm1_queue():
     """Test M/M/1 queue simulation"""
@@ -102,6 +105,178 @@ def test_mmc_queue():
     return True
 
 
+def test_run_fast():
+    """Test the vectorized fixed-customer simulation"""
+    print("\n\nTesting fast M/M/c simulation...")
+    print("-" * 50)
+
+    for servers, arrival_rate in [(1, 0.8), (3, 2.0)]:
+        sim = QueueSimulation(num_servers=servers, arrival_rate=arrival_rate, service_rate=1.0)
+        stats = sim.run_fast(200000, seed=1)
+        theo_stats = sim.get_theoretical_statistics()
+
+        wq_error = abs(stats['avg_waiting_time'] - theo_stats['avg_time_in_queue']) / theo_stats['avg_time_in_queue'] * 100
+        util_error = abs(stats['server_utilization'] - theo_stats['utilization']) / theo_stats['utilization'] * 100
+        print(f"  M/M/{servers}: Wq = {stats['avg_waiting_time']:.4f} "
+              f"(theory {theo_stats['avg_time_in_queue']:.4f}, error {wq_error:.2f}%)")
+
+        assert wq_error < 10 and util_error < 5
+
+    print("\n✓ Test PASSED: Fast simulation matches theoretical values")
+    return True
+
+
+def test_run_batch():
+    """Test parallel parameter sweeps"""
+    print("\n\nTesting batch simulation...")
+    print("-" * 50)
+
+    sim = QueueSimulation(num_servers=1, arrival_rate=0.8, service_rate=1.0)
+    rates = np.array([0.2, 0.5, 0.8])
+    results = sim.run_batch(rates, max_time=5000, seed=42)
+    again = sim.run_batch(rates, max_time=5000, seed=42)
+
+    for rate, wq in zip(rates, results['avg_waiting_time']):
+        print(f"  λ = {rate:.1f}: Wq = {wq:.4f}")
+
+    assert results['avg_waiting_time'].shape == rates.shape
+    assert np.array_equal(results['avg_waiting_time'], again['avg_waiting_time'])
+    assert np.all(np.diff(results['server_utilization']) > 0)
+
+    reps = sim.run_replicates(32, max_time=2000, seed=1)
+    mean = reps['mean']['avg_waiting_time']
+    stderr = reps['std']['avg_waiting_time'] / np.sqrt(32)
+    theory = sim.get_theoretical_statistics()['avg_time_in_queue']
+    print(f"  32 replicates: Wq = {mean:.4f} ± {stderr:.4f} (theory {theory:.4f})")
+    assert reps['results']['avg_waiting_time'].shape == (32,)
+    assert abs(mean - theory) < 4 * stderr
+
+    print("\n✓ Test PASSED: Batch runs are reproducible")
+    return True
+
+
+def test_event_heap():
+    """Test the array-backed departure heap"""
+    print("\n\nTesting event heap...")
+    print("-" * 50)
+
+    rng = np.random.default_rng(0)
+    times = rng.random(200)
+    keys = np.empty(200, dtype=np.float64)
+    ids = np.empty(200, dtype=np.int64)
+
+    size = 0
+    for i, t in enumerate(times):
+        size = _heap_push(keys, ids, size, t, i)
+
+    popped = []
+    while size > 0:
+        t, cid, size = _heap_pop(keys, ids, size)
+        assert times[cid] == t
+        popped.append(t)
+
+    assert popped == sorted(times)
+    print("\n✓ Test PASSED: Events are popped in time order")
+    return True
+
+
+def test_decimate():
+    """Test min-max decimation of plot data"""
+    print("\n\nTesting plot decimation...")
+    print("-" * 50)
+
+    t = np.arange(10007, dtype=np.float64)
+    y = np.random.rand(10007)
+    t_out, y_out = decimate(t, y, 1000)
+
+    print(f"  Points: {len(t)} -> {len(t_out)}")
+    assert len(t_out) <= 2 * 1000
+    assert np.all(np.diff(t_out) > 0)
+    assert y_out.min() == y.min() and y_out.max() == y.max()
+
+    # Series just over 2 * n_out samples are still reduced
+    t_mid, y_mid = decimate(t[:2500], y[:2500], 1000)
+    assert len(t_mid) <= 2 * 1000 and len(t_mid) < 2500
+    assert np.all(np.diff(t_mid) > 0)
+
+    # Short series are returned unchanged
+    t_short, y_short = decimate(t[:100], y[:100], 1000)
+    assert len(t_short) == 100
+
+    print("\n✓ Test PASSED: Decimation keeps the envelope of the data")
+    return True
+
+
+def test_history_fraction():
+    """Test that history thinning leaves the statistics unchanged"""
+    print("\n\nTesting history fraction...")
+    print("-" * 50)
+
+    full = QueueSimulation(num_servers=2, arrival_rate=1.5, service_rate=1.0)
+    full.run(max_time=2000, seed=7, record_history=True)
+    thin = QueueSimulation(num_servers=2, arrival_rate=1.5, service_rate=1.0,
+                           history_fraction=0.25)
+    thin.run(max_time=2000, seed=7, record_history=True)
+
+    print(f"  Samples: {full.n_samples} -> {thin.n_samples}")
+    assert abs(thin.n_samples - full.n_samples / 4) <= 1
+    assert thin.get_statistics() == full.get_statistics()
+
+    print("\n✓ Test PASSED: Thinned history gives identical statistics")
+    return True
+
+
+def test_reset_state():
+    """Test that a reset simulation reproduces a fresh one"""
+    print("\n\nTesting state reset...")
+    print("-" * 50)
+
+    fresh = QueueSimulation(num_servers=2, arrival_rate=1.5, service_rate=1.0)
+    fresh.run(max_time=1000, seed=11)
+
+    sim = QueueSimulation(num_servers=2, arrival_rate=1.5, service_rate=1.0)
+    sim.run(max_time=3000, seed=5)
+    capacity = len(sim.arrival_times)
+    sim.reset_state()
+    assert sim.current_time == 0 and sim.n_samples == 0
+    sim.run(max_time=1000, seed=11)
+
+    print(f"  Buffer capacity kept: {len(sim.arrival_times) == capacity}")
+    assert len(sim.arrival_times) == capacity
+    assert sim.get_statistics() == fresh.get_statistics()
+
+    print("\n✓ Test PASSED: Reset simulation matches a fresh one")
+    return True
+
+
+def test_customer_times():
+    """Test per-customer times against the running totals"""
+    print("\n\nTesting per-customer times...")
+    print("-" * 50)
+
+    sim = QueueSimulation(num_servers=3, arrival_rate=2.5, service_rate=1.0,
+                          keep_customer_times=True)
+    sim.run(max_time=500, seed=3)
+    times = sim.get_customer_times()
+
+    print(f"  Served: {len(times['waiting_time'])}")
+    assert len(times['waiting_time']) == sim.customers_served
+    assert np.all(times['waiting_time'] >= 0)
+    assert np.all(times['system_time'] >= times['waiting_time'])
+    assert np.isclose(times['waiting_time'].sum(), sim.total_waiting_time)
+    assert np.isclose(times['system_time'].sum(), sim.total_system_time)
+
+    # Without keep_customer_times the buffers are reused as ring buffers
+    ring = QueueSimulation(num_servers=3, arrival_rate=2.5, service_rate=1.0)
+    ring.run(max_time=500, seed=3)
+    print(f"  Buffer size: {len(sim.arrival_times)} -> {len(ring.arrival_times)}")
+    assert ring.get_statistics() == sim.get_statistics()
+    assert len(ring.arrival_times) < len(sim.arrival_times)
+
+    print("\n✓ Test PASSED: Per-customer times match the totals")
+    return True
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("Queue Simulation Test Suite")
@@ -109,9 +284,16 @@ if __name__ == '__main__':
 
     test1 = test_mm1_queue()
     test2 = test_mmc_queue()
+    test3 = test_run_fast()
+    test4 = test_run_batch()
+    test5 = test_event_heap()
+    test6 = test_decimate()
+    test7 = test_history_fraction()
+    test8 = test_customer_times()
+    test9 = test_reset_state()
 
     print("\n" + "=" * 50)
-    if test1 and test2:
+    if all([test1, test2, test3, test4, test5, test6, test7, test8, test9]):
         print("All tests completed successfully!")
     else:
         print("Some tests failed!")